@@ -1,20 +1,73 @@
 import numpy as np
 import psutil
-import pandas as pd
-from collections import deque
+from collections import deque, namedtuple
 import logging
 from datetime import datetime
-from sklearn.preprocessing import StandardScaler
-from tensorflow.keras.models import Model
-from tensorflow.keras.layers import Input, Dense
-from tensorflow.keras.optimizers import Adam
+
+# One snapshot of all running processes: aligned names/pids plus an (N, 5)
+# float32 array holding sensor_01..sensor_05 for each process.
+ProcessSnapshot = namedtuple('ProcessSnapshot', ['names', 'pids', 'data'])
+
+SENSOR_KEYS = ('sensor_01', 'sensor_02', 'sensor_03', 'sensor_04', 'sensor_05')
+
+ANOMALY_REASON = "Anomaly detected based on reconstruction error"
+
+def make_snapshot(names, pids, usage, core_freq, load_avg, num_processes):
+    """Build a ProcessSnapshot from per-process (cpu, memory) percentages and system-wide sensors"""
+    data = np.empty((len(usage), len(SENSOR_KEYS)), dtype=np.float32)
+    if usage:
+        data[:, :2] = usage
+    # System-wide sensors are constant within a snapshot, so broadcast them per column
+    data[:, 2] = core_freq
+    data[:, 3] = load_avg
+    data[:, 4] = num_processes
+    return ProcessSnapshot(np.array(names, dtype=object), np.array(pids, dtype=np.int64), data)
+
+def empty_snapshot():
+    return make_snapshot([], [], [], 0, 0, 0)
+
+def merge_snapshots(snapshots):
+    """Concatenate snapshots in order, keeping only the latest row for each pid"""
+    names = np.concatenate([snapshot.names for snapshot in snapshots])
+    pids = np.concatenate([snapshot.pids for snapshot in snapshots])
+    data = np.concatenate([snapshot.data for snapshot in snapshots])
+    # np.unique reports first occurrences, so search the reversed rows for the latest ones
+    _, first_from_end = np.unique(pids[::-1], return_index=True)
+    keep = np.sort(len(pids) - 1 - first_from_end)
+    return ProcessSnapshot(names[keep], pids[keep], data[keep])
+
+class _Scaler:
+    """Minimal StandardScaler replacement: (x - mean_) / scale_ per column"""
+
+    def fit_transform(self, data):
+        mean = data.mean(axis=0, dtype=np.float64)
+        std = data.std(axis=0, dtype=np.float64)
+        # Constant columns are left unscaled, as StandardScaler does; rounding in the
+        # input dtype leaves them a tiny non-zero std, so compare against its epsilon
+        is_constant = std <= 10 * np.finfo(data.dtype).eps * np.abs(mean)
+        self.mean_ = mean.astype(data.dtype)
+        self.scale_ = np.where(is_constant, 1.0, std).astype(data.dtype)
+        return self.transform(data)
+
+    def transform(self, data):
+        return (data - self.mean_) / self.scale_
+
+def mean_squared_error(data, reconstructed):
+    """Row-wise MSE; einsum reduces the squares without materialising them"""
+    diff = data - reconstructed
+    err = np.einsum('ij,ij->i', diff, diff, optimize=True)
+    err /= diff.shape[1]
+    return err
 
 class AdvancedAnomalyDetector:
-    def __init__(self, history_size=100):
+    def __init__(self, history_size=100, n_components=3):
         self.history_size = history_size
+        self.n_components = n_components
         self.process_history = deque(maxlen=history_size)
-        self.scaler = StandardScaler()
-        self.autoencoder = None
+        self.scaler = _Scaler()
+        self._mu = None
+        self._inv = None
+        self.components = None
         self.is_trained = False
         self.reconstruction_threshold = None
 
@@ -26,8 +79,10 @@ class AdvancedAnomalyDetector:
         )
 
     def collect_process_metrics(self):
-        """Collect detailed metrics for all running processes"""
-        process_metrics = []
+        """Collect detailed metrics for all running processes as a ProcessSnapshot"""
+        names = []
+        pids = []
+        usage = []
 
         # Get CPU frequency (MHz)
         try:
@@ -54,56 +109,27 @@ class AdvancedAnomalyDetector:
         for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent']):
             try:
                 pinfo = proc.info
-
-                metrics = {
-                    'pid': pinfo['pid'],
-                    'name': pinfo['name'],
-                    'sensor_01': pinfo.get('cpu_percent', 0) or 0,
-                    'sensor_02': pinfo.get('memory_percent', 0) or 0,
-                    'sensor_03': core_freq,
-                    'sensor_04': load_avg,
-                    'sensor_05': num_processes
-                }
-
-                process_metrics.append(metrics)
+                usage.append((pinfo.get('cpu_percent', 0) or 0, pinfo.get('memory_percent', 0) or 0))
+                pids.append(pinfo['pid'])
+                names.append(pinfo['name'])
 
             except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess) as e:
                 logging.warning(f"Error collecting metrics for process: {e}")
                 continue
 
-        return process_metrics
+        return make_snapshot(names, pids, usage, core_freq, load_avg, num_processes)
 
-    def update_history(self):
-        current_metrics = self.collect_process_metrics()
-        self.process_history.append(current_metrics)
+    def update_history(self, snapshot=None):
+        if snapshot is None:
+            snapshot = self.collect_process_metrics()
+        self.process_history.append(snapshot)
         logging.info(f"Updated process history. Current size: {len(self.process_history)}")
 
     def prepare_training_data(self):
         if not self.process_history:
             return None
 
-        all_data = []
-        for metrics in self.process_history:
-            for proc in metrics:
-                all_data.append([
-                    proc['sensor_01'],
-                    proc['sensor_02'],
-                    proc['sensor_03'],
-                    proc['sensor_04'],
-                    proc['sensor_05']
-                ])
-
-        return np.array(all_data)
-
-    def build_autoencoder(self, input_dim):
-        inp = Input(shape=(input_dim,))
-        x = Dense(16, activation='relu')(inp)
-        x = Dense(8, activation='relu')(x)
-        x = Dense(16, activation='relu')(x)
-        out = Dense(input_dim, activation='linear')(x)
-        model = Model(inputs=inp, outputs=out)
-        model.compile(optimizer=Adam(learning_rate=0.001), loss='mse')
-        return model
+        return np.vstack([snapshot.data for snapshot in self.process_history])
 
     def train_model(self):
         data = self.prepare_training_data()
@@ -113,70 +139,94 @@ class AdvancedAnomalyDetector:
 
         try:
             scaled_data = self.scaler.fit_transform(data)
-            input_dim = scaled_data.shape[1]
-            self.autoencoder = self.build_autoencoder(input_dim)
-            self.autoencoder.fit(scaled_data, scaled_data, epochs=50, batch_size=32, verbose=0)
-            reconstructed = self.autoencoder.predict(scaled_data)
-            reconstruction_error = np.mean(np.square(scaled_data - reconstructed), axis=1)
-            self.reconstruction_threshold = np.percentile(reconstruction_error, 95)  # 95th percentile
+            # Cache the fitted statistics as a multiply so detection skips the division
+            self._mu = self.scaler.mean_.astype(np.float32)
+            self._inv = (1.0 / self.scaler.scale_).astype(np.float32)
+            # The scaled data is already centred, so its leading right-singular vectors
+            # are the principal axes; the residual outside them is the anomaly score
+            _, singular_values, vt = np.linalg.svd(scaled_data, full_matrices=False)
+            # Keep fewer components than the data's effective rank; otherwise (e.g. a single
+            # snapshot, where three columns are constant) the reconstruction is exact and
+            # the threshold only measures rounding error
+            tol = singular_values[0] * max(scaled_data.shape) * np.finfo(scaled_data.dtype).eps
+            rank = int(np.count_nonzero(singular_values > tol))
+            n_components = max(min(self.n_components, rank - 1), 0)
+            if n_components == 0:
+                logging.warning("Insufficient variation in training data for PCA")
+                return False
+            self.components = vt[:n_components].astype(np.float32)
+            reconstructed = self.reconstruct(scaled_data)
+            reconstruction_error = mean_squared_error(scaled_data, reconstructed)
+            # 95th percentile via introselect, avoiding a full sort of the errors
+            k = int(0.95 * len(reconstruction_error))
+            self.reconstruction_threshold = np.partition(reconstruction_error, k)[k]
             self.is_trained = True
-            logging.info("Successfully trained autoencoder-based anomaly detection model")
+            logging.info(f"Successfully trained PCA-based anomaly detection model with {n_components} components")
             return True
         except Exception as e:
-            logging.error(f"Error training autoencoder: {e}")
+            logging.error(f"Error training PCA model: {e}")
             return False
 
-    def detect_anomalies(self, processes):
-        if not self.is_trained or self.autoencoder is None:
-            logging.warning("Autoencoder model not trained")
-            return []
+    def reconstruct(self, scaled_data):
+        """Project onto the principal components and back into sensor space"""
+        return (scaled_data @ self.components.T) @ self.components
+
+    def detect_anomalies(self, snapshot):
+        return self.detect_anomalies_batch([snapshot])[0]
+
+    def detect_anomalies_batch(self, snapshots):
+        """Score several snapshots in one pass, returning the anomalous rows of each as a ProcessSnapshot"""
+        if not self.is_trained or self.components is None:
+            logging.warning("PCA model not trained")
+            return [empty_snapshot() for _ in snapshots]
 
         try:
-            current_data = []
-            for proc in processes:
-                current_data.append([
-                    proc['sensor_01'],
-                    proc['sensor_02'],
-                    proc['sensor_03'],
-                    proc['sensor_04'],
-                    proc['sensor_05']
-                ])
-
-            scaled_data = self.scaler.transform(current_data)
-            reconstructed = self.autoencoder.predict(scaled_data)
-            reconstruction_error = np.mean(np.square(scaled_data - reconstructed), axis=1)
-
-            anomalies = []
-            for i, err in enumerate(reconstruction_error):
-                if err > self.reconstruction_threshold:  # Using dynamic threshold
-                    processes[i]['anomaly_reason'] = "Anomaly detected based on reconstruction error"
-                    anomalies.append(processes[i])
-
-            logging.info(f"Detected {len(anomalies)} anomalous processes")
-            return anomalies
+            current_data = np.vstack([snapshot.data for snapshot in snapshots])
+            scaled_data = (current_data - self._mu) * self._inv
+            reconstructed = self.reconstruct(scaled_data)
+            reconstruction_error = mean_squared_error(scaled_data, reconstructed)
+
+            # Using dynamic threshold
+            is_anomalous = reconstruction_error > self.reconstruction_threshold
+            offsets = np.cumsum([len(snapshot.pids) for snapshot in snapshots])
+
+            results = []
+            start = 0
+            for snapshot, end in zip(snapshots, offsets):
+                mask = is_anomalous[start:end]
+                results.append(ProcessSnapshot(snapshot.names[mask], snapshot.pids[mask], snapshot.data[mask]))
+                start = end
+
+            logging.info(
+                f"Detected {sum(len(anomalies.pids) for anomalies in results)} anomalous processes "
+                f"across {len(snapshots)} snapshots"
+            )
+            return results
 
         except Exception as e:
             logging.error(f"Error during anomaly detection: {e}")
-            return []
-
-    def generate_report(self, anomalies):
+            return [empty_snapshot() for _ in snapshots]
+
+    def generate_report(self, anomalies, snapshots=None):
+        """Report anomalies found across snapshots (default: the latest history entry)"""
+        if snapshots is None:
+            snapshots = [self.process_history[-1]] if self.process_history else []
+        # Anomalies may come from several snapshots, so count every distinct process they covered
+        pids = [snapshot.pids for snapshot in snapshots]
+        total_processes = len(np.unique(np.concatenate(pids))) if pids else 0
+        # Round away float32 storage noise (91.9000015 -> 91.9); 4 decimals stays within float32 precision
+        sensor_rows = np.round(anomalies.data.astype(np.float64), 4).tolist()
         report = {
             'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            'total_processes': len(self.process_history[-1]) if self.process_history else 0,
-            'anomaly_count': len(anomalies),
-            'anomalies': []
+            'snapshot_count': len(snapshots),
+            'total_processes': total_processes,
+            'anomaly_count': len(anomalies.pids),
+            # Rows come straight from the aligned snapshot columns; sensor_05 is a process count
+            'anomalies': [
+                {'id': pid, 'sensor': name, 'reason': ANOMALY_REASON,
+                 **dict(zip(SENSOR_KEYS[:4], sensors)), 'sensor_05': int(sensors[4])}
+                for pid, name, sensors in zip(anomalies.pids.tolist(), anomalies.names.tolist(), sensor_rows)
+            ]
         }
 
-        for proc in anomalies:
-            report['anomalies'].append({
-                'id': proc['pid'],
-                'sensor': proc['name'],
-                'reason': proc['anomaly_reason'],
-                'sensor_01': proc['sensor_01'],
-                'sensor_02': proc['sensor_02'],
-                'sensor_03': proc['sensor_03'],
-                'sensor_04': proc['sensor_04'],
-                'sensor_05': proc['sensor_05']
-            })
-
         return report
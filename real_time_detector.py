@@ -1,6 +1,8 @@
 import sys
 import time
 import psutil
+import numpy as np
+from collections import deque
 from datetime import datetime
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                              QTableWidget, QTableWidgetItem, QPushButton, QLabel,
@@ -9,8 +11,20 @@ from PyQt5.QtCore import QTimer, Qt, QRunnable, QThreadPool, pyqtSlot, QObject,
 from PyQt5.QtGui import QColor
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from advanced_anomaly_detector import AdvancedAnomalyDetector
-import json
+from advanced_anomaly_detector import AdvancedAnomalyDetector, make_snapshot, merge_snapshots
+import orjson
+
+# Most recent refresh snapshots kept for the next anomaly check, which scores
+# them together in one model call and reports on all of them
+SNAPSHOT_BATCH_SIZE = 16
+# Auto refresh period; also the delay before the first sample, so the
+# non-blocking CPU reading covers a full interval
+REFRESH_INTERVAL_MS = 3000
+# Number of samples kept per sensor graph
+HISTORY_LENGTH = 50
+# Seconds of empty time axis added past the newest sample, so most refreshes
+# fit inside the current limits and can be blitted without a full redraw
+TIME_AXIS_HEADROOM = 30.0
 
 class WorkerSignals(QObject):
     finished = pyqtSignal(dict)
@@ -24,7 +38,8 @@ class StatsWorker(QRunnable):
     @pyqtSlot()
     def run(self):
         try:
-            cpu_percent = psutil.cpu_percent(interval=0.1)
+            # Non-blocking: reports usage since the previous call (seeded in ProcessMonitorUI)
+            cpu_percent = psutil.cpu_percent(interval=None)
             memory = psutil.virtual_memory()
             load_avg = psutil.getloadavg()
             num_procs = len(psutil.pids())
@@ -35,11 +50,22 @@ class StatsWorker(QRunnable):
             except Exception:
                 cpu_freq = 0
 
+            # One pass over the process table feeds both the UI list and the detector snapshot
             processes = []
-            for proc in psutil.process_iter(['pid', 'name', 'username', 'cpu_percent', 'status', 'create_time', 'cmdline']):
+            names = []
+            pids = []
+            usage = []
+            for proc in psutil.process_iter(['pid', 'name', 'username', 'cpu_percent', 'memory_percent',
+                                             'memory_info', 'status', 'create_time', 'cmdline']):
                 try:
                     pinfo = proc.info
-                    memory_mb = proc.memory_info().rss / 1024 / 1024
+                    names.append(pinfo['name'])
+                    pids.append(pinfo['pid'])
+                    usage.append((pinfo['cpu_percent'] or 0, pinfo['memory_percent'] or 0))
+
+                    if pinfo['memory_info'] is None:
+                        continue
+                    memory_mb = pinfo['memory_info'].rss / 1024 / 1024
                     created = datetime.fromtimestamp(pinfo['create_time']).strftime('%Y-%m-%d %H:%M:%S')
 
                     processes.append({
@@ -55,13 +81,16 @@ class StatsWorker(QRunnable):
                 except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
                     continue
 
+            snapshot = make_snapshot(names, pids, usage, cpu_freq, load_avg[0], num_procs)
+
             self.signals.finished.emit({
                 'cpu_percent': cpu_percent,
                 'memory': memory,
                 'load_avg': load_avg,
                 'cpu_freq': cpu_freq,  
                 'num_procs': num_procs,
-                'processes': processes
+                'processes': processes,
+                'snapshot': snapshot
             })
 
         except Exception as e:
@@ -109,6 +138,11 @@ class ProcessMonitorUI(QMainWindow):
         self.setGeometry(100, 100, 1200, 800)
 
         self.anomaly_detector = AdvancedAnomalyDetector()
+        # Seed the system-wide CPU baseline so workers can sample without blocking
+        psutil.cpu_percent(interval=None)
+        self.pending_snapshots = deque(maxlen=SNAPSHOT_BATCH_SIZE)
+        self.latest_snapshot = None
+        self.latest_processes = None
 
         main_widget = QWidget()
         self.setCentralWidget(main_widget)
@@ -123,14 +157,27 @@ class ProcessMonitorUI(QMainWindow):
         self.figure, self.axes = plt.subplots(5, 1, figsize=(10, 10))
         self.canvas = FigureCanvas(self.figure)
 
+        # Fixed-size ring buffers; history_index is the next slot to overwrite
         self.data_history = {
-            'time': [],
-            'sensor_01': [],
-            'sensor_02': [],
-            'sensor_03': [],
-            'sensor_04': [],
-            'sensor_05': []
+            key: np.zeros(HISTORY_LENGTH, dtype=np.float32)
+            for key in ('time', 'sensor_01', 'sensor_02', 'sensor_03', 'sensor_04', 'sensor_05')
         }
+        self.history_index = 0
+        self.history_filled = 0
+
+        # Lines are created once and animated, so refreshes only repaint the
+        # lines over cached axes backgrounds instead of redrawing the figure
+        self.sensor_lines = []
+        for ax, key, color in zip(self.axes, list(self.data_history.keys())[1:], ['blue', 'red', 'orange', 'green', 'purple']):
+            line, = ax.plot([], [], color=color, label=key, animated=True)
+            ax.set_title(key)
+            ax.legend()
+            ax.grid(True)
+            self.sensor_lines.append(line)
+        self.figure.tight_layout()
+        self.axes_backgrounds = None
+        self.canvas.mpl_connect('draw_event', self.on_canvas_draw)
+        self.canvas.mpl_connect('resize_event', lambda event: self.figure.tight_layout())
 
         control_layout = QHBoxLayout()
         self.refresh_button = QPushButton("Refresh")
@@ -172,11 +219,12 @@ class ProcessMonitorUI(QMainWindow):
         self.timer.timeout.connect(self.update_data)
         self.threadpool = QThreadPool()
 
-        self.update_data()
+        # The first sample waits a full interval after the CPU baseline was seeded
+        QTimer.singleShot(REFRESH_INTERVAL_MS, self.update_data)
 
     def toggle_auto_refresh(self, checked):
         if checked:
-            self.timer.start(3000)
+            self.timer.start(REFRESH_INTERVAL_MS)
             self.refresh_button.setEnabled(False)
         else:
             self.timer.stop()
@@ -188,15 +236,15 @@ class ProcessMonitorUI(QMainWindow):
 
     def on_data_ready(self, data):
         current_time = time.time() - self.start_time
-        self.data_history['time'].append(current_time)
-        self.data_history['sensor_01'].append(data['cpu_percent'])
-        self.data_history['sensor_02'].append(data['memory'].percent)
-        self.data_history['sensor_03'].append(data['cpu_freq'])
-        self.data_history['sensor_04'].append(data['load_avg'][0])
-        self.data_history['sensor_05'].append(data['num_procs'])
-        if len(self.data_history['time']) > 50:
-            for key in self.data_history:
-                self.data_history[key].pop(0)
+        idx = self.history_index
+        self.data_history['time'][idx] = current_time
+        self.data_history['sensor_01'][idx] = data['cpu_percent']
+        self.data_history['sensor_02'][idx] = data['memory'].percent
+        self.data_history['sensor_03'][idx] = data['cpu_freq']
+        self.data_history['sensor_04'][idx] = data['load_avg'][0]
+        self.data_history['sensor_05'][idx] = data['num_procs']
+        self.history_index = (idx + 1) % HISTORY_LENGTH
+        self.history_filled = min(self.history_filled + 1, HISTORY_LENGTH)
 
         self.system_info_label.setText(
             f"Sensor_01: {data['cpu_percent']}% | "
@@ -206,21 +254,66 @@ class ProcessMonitorUI(QMainWindow):
             f"Sensor_05 (Procs): {data['num_procs']}"
         )
 
-        for ax, key, color in zip(self.axes, list(self.data_history.keys())[1:], ['blue', 'red', 'orange', 'green', 'purple']):
-            ax.clear()
-            ax.plot(self.data_history['time'], self.data_history[key], color=color, label=key)
-            ax.set_title(key)
-            ax.legend()
-            ax.grid(True)
-
-        self.figure.tight_layout()
-        self.canvas.draw()
+        times = self.history_series('time')
+        limits_changed = False
+        if times[-1] >= self.axes[0].get_xlim()[1]:
+            for ax in self.axes:
+                ax.set_xlim(times[0], times[-1] + TIME_AXIS_HEADROOM)
+            limits_changed = True
+
+        for ax, line, key in zip(self.axes, self.sensor_lines, list(self.data_history.keys())[1:]):
+            line.set_data(times, self.history_series(key))
+            old_ylim = ax.get_ylim()
+            ax.relim()
+            ax.autoscale_view(scalex=False)
+            limits_changed |= ax.get_ylim() != old_ylim
+
+        if limits_changed or self.axes_backgrounds is None:
+            # Ticks moved, so the cached backgrounds are stale; on_canvas_draw recaptures them
+            self.canvas.draw()
+        else:
+            self.blit_sensor_lines()
+
+        self.latest_snapshot = data['snapshot']
+        self.latest_processes = data['processes']
+        if self.anomaly_detector.is_trained:
+            self.pending_snapshots.append(data['snapshot'])
+
+    def on_canvas_draw(self, event):
+        if not self.sensor_lines[0].get_animated():
+            # savefig is drawing the lines into the figure; a background taken now would include them
+            return
+        self.axes_backgrounds = [self.canvas.copy_from_bbox(ax.bbox) for ax in self.axes]
+        for ax, line in zip(self.axes, self.sensor_lines):
+            ax.draw_artist(line)
+
+    def blit_sensor_lines(self):
+        for ax, line, background in zip(self.axes, self.sensor_lines, self.axes_backgrounds):
+            self.canvas.restore_region(background)
+            ax.draw_artist(line)
+            self.canvas.blit(ax.bbox)
+
+    def history_series(self, key):
+        """Return the buffered samples for key in chronological order"""
+        values = self.data_history[key]
+        if self.history_filled < HISTORY_LENGTH:
+            return values[:self.history_filled]
+        return np.concatenate((values[self.history_index:], values[:self.history_index]))
 
     def save_resource_snapshot(self):
         try:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
             filename = f"sensor_snapshot_{timestamp}.png"
-            self.figure.savefig(filename)
+            # Animated lines are skipped by a normal figure draw, so include them for saving
+            for line in self.sensor_lines:
+                line.set_animated(False)
+            try:
+                self.figure.savefig(filename)
+            finally:
+                for line in self.sensor_lines:
+                    line.set_animated(True)
+                # Recapture clean axes backgrounds for the following blits
+                self.canvas.draw()
             self.status_label.setText(f"Snapshot saved as {filename}")
             self.status_label.setStyleSheet("color: #4CAF50;")
         except Exception as e:
@@ -229,7 +322,18 @@ class ProcessMonitorUI(QMainWindow):
 
     def check_anomalies(self):
         try:
-            self.anomaly_detector.update_history()
+            snapshot = self.latest_snapshot
+            if snapshot is None:
+                self.status_label.setText("Waiting for the first sensor refresh")
+                return
+
+            history = self.anomaly_detector.process_history
+            if history and history[-1] is snapshot:
+                self.status_label.setText("No new sample since the last check; wait for the next refresh")
+                self.status_label.setStyleSheet("color: #666; font-style: italic;")
+                return
+
+            self.anomaly_detector.update_history(snapshot)
             if not self.anomaly_detector.is_trained:
                 self.status_label.setText("Training anomaly detection model...")
                 self.status_label.setStyleSheet("color: #2196F3;")
@@ -237,16 +341,22 @@ class ProcessMonitorUI(QMainWindow):
                     self.status_label.setText("Need more data to train model")
                     return
 
-            current_metrics = self.anomaly_detector.collect_process_metrics()
-            anomalies = self.anomaly_detector.detect_anomalies(current_metrics)
-            report = self.anomaly_detector.generate_report(anomalies)
+            # Score the refresh snapshots queued since the last check together with the
+            # current one, reporting each anomalous process once at its latest reading
+            if not self.pending_snapshots or self.pending_snapshots[-1] is not snapshot:
+                self.pending_snapshots.append(snapshot)
+            snapshots = list(self.pending_snapshots)
+            self.pending_snapshots.clear()
+            anomalies = merge_snapshots(self.anomaly_detector.detect_anomalies_batch(snapshots))
+            report = self.anomaly_detector.generate_report(anomalies, snapshots)
 
             report_file = f'anomaly_report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
-            with open(report_file, 'w') as f:
-                json.dump(report, f, indent=2)
+            with open(report_file, 'wb') as f:
+                f.write(orjson.dumps(report, option=orjson.OPT_INDENT_2))
 
             self.status_label.setText(
-                f"Found {len(anomalies)} anomalous processes. Report saved to {report_file}"
+                f"Found {len(anomalies.pids)} anomalous processes over {len(snapshots)} snapshots. "
+                f"Report saved to {report_file}"
             )
             self.status_label.setStyleSheet("color: #4CAF50;")
 
@@ -255,12 +365,14 @@ class ProcessMonitorUI(QMainWindow):
             self.status_label.setStyleSheet("color: #F44336;")
 
     def show_process_table(self):
-        def callback(data):
-            self.process_window = ProcessTableWindow(data['processes'])
-            self.process_window.exec_()
-
-        worker = StatsWorker(callback)
-        self.threadpool.start(worker)
+        # Reuse the last refresh: another process scan would reset psutil's
+        # cpu_percent baselines and shorten the next refresh's sampling window
+        if self.latest_processes is None:
+            self.status_label.setText("Waiting for the first sensor refresh")
+            return
+
+        self.process_window = ProcessTableWindow(self.latest_processes)
+        self.process_window.exec_()
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)